@@ -12,7 +12,10 @@ import urllib.error
 import urllib.parse
 import sqlite3
 import socket
+import struct
 from datetime import datetime, timedelta
+from rir2mmdb import RIRMMDBExport
+from intervalset import range_to_cidrs, ip2int
 
 
 class RIRDatabase:
@@ -26,6 +29,7 @@ class RIRDatabase:
             os.mkdir(dbhome)
         self.dbname = '{}/rir.db'.format(dbhome)
         self.lastfetch = '{}/lastfetchdate'.format(dbhome)
+        self.snapshot = '{}/snapshot'.format(dbhome)
         self.dbh = self.SQLconnect()
 
     def SQLconnect(self):
@@ -41,6 +45,20 @@ CREATE TABLE IF NOT EXISTS rir
 )
 """
         cur.execute(sql)
+        cur.execute("""\
+CREATE INDEX IF NOT EXISTS rir_reg_id ON rir (reg_id)""")
+        # numeric first/last of every resource held by a reg_id, used to
+        # find the organisation for an ASN or address.  ipv6 ranges are
+        # kept as their upper 64 bits to fit an SQLite integer.
+        sql = """\
+CREATE TABLE IF NOT EXISTS org_index
+(
+    reg_id TEXT, registry TEXT, type TEXT, first INT, last INT
+)
+"""
+        cur.execute(sql)
+        cur.execute("""\
+CREATE INDEX IF NOT EXISTS org_index_first ON org_index (type, first)""")
         sql = """\
 CREATE TABLE IF NOT EXISTS country_codes
 (
@@ -49,9 +67,149 @@ CREATE TABLE IF NOT EXISTS country_codes
 )
 """
         cur.execute(sql)
+        # per registry/cc/type/status totals for each ingest date.
+        # units are addresses for ipv4, /64 networks for ipv6 and
+        # AS numbers for asn records.
+        sql = """\
+CREATE TABLE IF NOT EXISTS rir_summary
+(
+    date TEXT, registry TEXT, cc TEXT, type TEXT, status TEXT,
+    records INT, prefixes INT, units INT
+)
+"""
+        cur.execute(sql)
+        cur.execute("""\
+CREATE INDEX IF NOT EXISTS rir_summary_date
+ON rir_summary (date, registry)""")
+        sql = """\
+CREATE TABLE IF NOT EXISTS rir_summary_report
+(
+    scope TEXT, key TEXT, type TEXT, status TEXT,
+    records INT, prefixes INT, units INT,
+    records_delta INT, prefixes_delta INT, units_delta INT,
+    date TEXT, prev_date TEXT
+)
+"""
+        cur.execute(sql)
+        cur.execute("""\
+CREATE INDEX IF NOT EXISTS rir_summary_report_key
+ON rir_summary_report (scope, key)""")
         dbh.commit()
         return dbh
 
+    def _summarize(self, summary, cc, type, start, value, status):
+        if type == 'ipv4':
+            first = struct.unpack('!L', socket.inet_aton(start))[0]
+            last = first + int(value) - 1
+            prefixes = len(range_to_cidrs(first, last, 32))
+            units = int(value)
+        elif type == 'ipv6':
+            prefixes = 1
+            units = 1 << max(0, 64 - int(value))
+        elif type == 'asn':
+            prefixes = 0
+            units = int(value)
+        else:
+            return
+        key = (cc, type, status)
+        if key not in summary:
+            summary[key] = [0, 0, 0]
+        summary[key][0] += 1
+        summary[key][1] += prefixes
+        summary[key][2] += units
+
+    def _org_range(self, type, start, value):
+        if type == 'asn':
+            first = int(start)
+            return first, first + int(value) - 1
+        first = ip2int(start)
+        if type == 'ipv4':
+            return first, first + int(value) - 1
+        last = first + (1 << (128 - int(value))) - 1
+        return first >> 64, last >> 64
+
+    def Insert_Org_Index(self, rir, orgs):
+        cur = self.dbh.cursor()
+        cur.execute('DELETE FROM org_index WHERE registry = ?', [rir])
+        sql = """\
+INSERT INTO org_index (reg_id, registry, type, first, last)
+VALUES ( ?, ?, ?, ?, ? )
+"""
+        cur.executemany(sql, orgs)
+
+    def Insert_Summary(self, rir, summary):
+        today = datetime.utcnow().strftime('%Y%m%d')
+        cur = self.dbh.cursor()
+        cur.execute(
+            'DELETE FROM rir_summary WHERE date = ? AND registry = ?',
+            [today, rir]
+        )
+        sql = """\
+INSERT INTO rir_summary (
+    date, registry, cc, type, status, records, prefixes, units
+)
+VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )
+"""
+        for (cc, type, status), counts in summary.items():
+            cur.execute(sql, [today, rir, cc, type, status] + counts)
+
+    def UpdateSummaryReport(self):
+        cur = self.dbh.cursor()
+        cur.execute(
+            'SELECT registry, MAX(date) FROM rir_summary GROUP BY registry')
+        latest = dict(cur.fetchall())
+        if not latest:
+            return
+        date = max(latest.values())
+
+        # each registry reports from its own latest summary, so one that
+        # failed to fetch today keeps its last counts with no delta
+        snapshots = []
+        prev_dates = []
+        for registry, last in latest.items():
+            cur.execute("""\
+SELECT MAX(date) FROM rir_summary WHERE registry = ? AND date < ?""",
+                        [registry, last])
+            prev = cur.fetchone()[0]
+            if last < date or not prev:
+                prev = last
+            else:
+                prev_dates.append(prev)
+            snapshots.append((registry, last, prev))
+        prev_date = max(prev_dates) if prev_dates else None
+
+        totals = {}
+        for registry, last, prev in snapshots:
+            for i, d in enumerate([last, prev]):
+                cur.execute("""\
+SELECT cc, type, status, records, prefixes, units
+FROM rir_summary WHERE registry = ? AND date = ?""", [registry, d])
+                for cc, type, status, *counts in cur.fetchall():
+                    for scope, key in (
+                            ('cc', cc), ('registry', registry),
+                            ('total', '*')):
+                        k = (scope, key, type, status)
+                        if k not in totals:
+                            totals[k] = [[0, 0, 0], [0, 0, 0]]
+                        for j in range(3):
+                            totals[k][i][j] += counts[j]
+
+        cur.execute('DELETE FROM rir_summary_report')
+        sql = """\
+INSERT INTO rir_summary_report (
+    scope, key, type, status, records, prefixes, units,
+    records_delta, prefixes_delta, units_delta, date, prev_date
+)
+VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )
+"""
+        for k, (cur_counts, prev_counts) in totals.items():
+            deltas = [c - p for c, p in zip(cur_counts, prev_counts)]
+            cur.execute(
+                sql, list(k) + cur_counts + deltas + [date, prev_date])
+        self.dbh.commit()
+        print('[*] Summary report updated for {} (previous {})'.format(
+            date, prev_date))
+
     def Insert_RIR_Records(self, rir, data):
         if not data:
             return [0, 0]
@@ -60,10 +218,14 @@ CREATE TABLE IF NOT EXISTS country_codes
         self.dbh.commit()
         recs = 0
         errs = 0
+        sum_errs = 0
+        org_errs = 0
+        summary = {}
+        orgs = []
         for line in data.split('\n'):
             if not line or \
                     re.match(r'^#', line) or \
-                    re.match(r'^\d\.\d.+', line) or \
+                    re.match(r'^\d+(\.\d+)?\|', line) or \
                     re.match(r'^.+\|summary', line):
                 continue
             reg_id = ''
@@ -108,6 +270,27 @@ VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )
                 errs += 1
                 continue
             recs += 1
+            # the row is stored, a malformed count only skips the summary
+            try:
+                self._summarize(summary, cc, type, start, value, status)
+            except (ValueError, OSError):
+                sum_errs += 1
+            if reg_id and status in ('assigned', 'allocated'):
+                try:
+                    first, last = self._org_range(type, start, value)
+                except (ValueError, OSError):
+                    org_errs += 1
+                    continue
+                if last < 1 << 63:
+                    orgs.append([reg_id, rir, type, first, last])
+        if sum_errs:
+            print('[-] {}: {:d} records left out of summary'.format(
+                rir, sum_errs))
+        if org_errs:
+            print('[-] {}: {:d} records left out of org index'.format(
+                rir, org_errs))
+        self.Insert_Summary(rir, summary)
+        self.Insert_Org_Index(rir, orgs)
         self.dbh.commit()
         return [recs, errs]
 
@@ -220,13 +403,25 @@ INSERT INTO country_codes VALUES ('AP', 'non-iso3166:Asia-Pacific')""")
         f.write('{}\n'.format(today))
         f.close()
 
+    def UpdateSnapshot(self):
+        # consumers such as the riracl.py output cache key on this id
+        snapshot = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        tmpfile = '{}.tmp'.format(self.snapshot)
+        with open(tmpfile, 'w') as f:
+            f.write('{}\n'.format(snapshot))
+        os.replace(tmpfile, self.snapshot)
+
     def run(self):
         if self.has_run_today() and not options.force:
             print('[*] Exiting: Data has already been fetched today')
             return
         self.UpdateCountryCodes()
         self.RegionalRegistryData()
+        self.UpdateSummaryReport()
         self.UpdateLastDate()
+        self.UpdateSnapshot()
+        if options.mmdb:
+            RIRMMDBExport(self.dbname).write(options.mmdb)
 
 
 if __name__ == '__main__':
@@ -251,6 +446,10 @@ if __name__ == '__main__':
         '--force', action='store_true',
         default=False, help='Force DB update'
     )
+    parser.add_argument(
+        '--mmdb', metavar='FILE',
+        help='Export a MaxMind DB format file after the update'
+    )
     options = parser.parse_args()
 
     print('{}'.format(desc))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import socket
+import struct
+
+
+def range_to_cidrs(start, end, bits):
+    """
+    Split the inclusive integer range [start, end] into the minimal
+    list of aligned (network, prefixlen) blocks.
+    """
+    cidrs = []
+    while start <= end:
+        if start:
+            size = (start & -start).bit_length() - 1
+        else:
+            size = bits
+        size = min(size, (end - start + 1).bit_length() - 1)
+        cidrs.append((start, bits - size))
+        start += 1 << size
+    return cidrs
+
+
+def ip2int(ip):
+    if ':' in ip:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+    return struct.unpack('!L', socket.inet_aton(ip))[0]
+
+
+def int2ip(value, bits):
+    if bits == 128:
+        return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, 'big'))
+    return socket.inet_ntoa(struct.pack('!L', value))
+
+
+class IntervalSet:
+    """
+    Set of addresses held as sorted, disjoint, non-adjacent inclusive
+    integer intervals over a 32 (IPv4) or 128 (IPv6) bit space.
+    """
+
+    def __init__(self, intervals=(), bits=32):
+        self.bits = bits
+        self.intervals = self._normalize(intervals)
+
+    @classmethod
+    def from_cidrs(cls, cidrs, bits=32):
+        intervals = []
+        for cidr in cidrs:
+            network, prefixlen = cidr.split('/')
+            start = ip2int(network)
+            size = 1 << (bits - int(prefixlen))
+            start &= ~(size - 1)
+            intervals.append((start, start + size - 1))
+        return cls(intervals, bits)
+
+    def _normalize(self, intervals):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1] + 1:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        return [tuple(i) for i in merged]
+
+    def _new(self, intervals):
+        s = IntervalSet(bits=self.bits)
+        s.intervals = intervals
+        return s
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __eq__(self, other):
+        return self.bits == other.bits and self.intervals == other.intervals
+
+    def size(self):
+        return sum(end - start + 1 for start, end in self.intervals)
+
+    def union(self, other):
+        return IntervalSet(self.intervals + other.intervals, self.bits)
+
+    def intersection(self, other):
+        result = []
+        a = self.intervals
+        b = other.intervals
+        i = j = 0
+        while i < len(a) and j < len(b):
+            start = max(a[i][0], b[j][0])
+            end = min(a[i][1], b[j][1])
+            if start <= end:
+                result.append((start, end))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return self._new(result)
+
+    def complement(self):
+        result = []
+        last = 0
+        for start, end in self.intervals:
+            if start > last:
+                result.append((last, start - 1))
+            last = end + 1
+        top = (1 << self.bits) - 1
+        if last <= top:
+            result.append((last, top))
+        return self._new(result)
+
+    def difference(self, other):
+        return self.intersection(other.complement())
+
+    def cidrs(self):
+        for start, end in self.intervals:
+            for network, prefixlen in range_to_cidrs(start, end, self.bits):
+                yield network, prefixlen
@@ -1,13 +1,70 @@
 #!/usr/bin/env python3
 
 import argparse
-import radix
+import heapq
 import sys
 import re
 import os
 import struct
 import socket
-import sqlite3
+from ririndex import RIRIndex
+from rirlookupd import RIRLookupClient, default_socket
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitter counter (Metwally, Agrawal, El Abbadi 2005).
+
+    At most 'capacity' keys are monitored.  When a new key arrives and
+    the table is full, the key with the smallest count is evicted and
+    the newcomer inherits that count as its maximum overestimate.  Any
+    reported count exceeds the true count by at most total/capacity.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        self.heap = []
+
+    def update(self, key):
+        self.total += 1
+        if key in self.counts:
+            self.counts[key] += 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (1, key))
+            return
+
+        # heap entries are refreshed lazily, a stale entry is
+        # never larger than the real count for its key.
+        while True:
+            count, victim = self.heap[0]
+            if self.counts[victim] == count:
+                break
+            heapq.heapreplace(self.heap, (self.counts[victim], victim))
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[key] = count + 1
+        self.errors[key] = count
+        heapq.heapreplace(self.heap, (count + 1, key))
+
+    def error_bound(self):
+        if len(self.counts) < self.capacity:
+            return 0
+        return self.total // self.capacity
+
+    def top(self, n=None):
+        if n is None:
+            items = sorted(
+                self.counts, key=self.counts.__getitem__, reverse=True)
+        else:
+            items = heapq.nlargest(
+                n, self.counts, key=self.counts.__getitem__)
+        return [(k, self.counts[k], self.errors[k]) for k in items]
 
 
 class RIRLogStats:
@@ -15,12 +72,29 @@ class RIRLogStats:
     def __init__(self):
         dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
         self.dbname = '{}/rir.db'.format(dbhome)
-        self.dbh = sqlite3.connect(self.dbname)
-        self.dbh.text_factory = str
-        self.records = []
-        self.rib = radix.Radix()
+        self.index = None
+        self.batch_size = 1000
+        self.pending = []
+        self.total = 0
         self.country = {}
         self.freq = {}
+        self.hh_addr = None
+        self.hh_prefix = None
+        self.hh_alloc = None
+
+    def _init_heavy_hitters(self, options):
+        if not options.heavy_hitters:
+            return
+        self.hh_addr = SpaceSaving(options.hh_capacity)
+        self.hh_prefix = SpaceSaving(options.hh_capacity)
+        self.hh_alloc = SpaceSaving(options.hh_capacity)
+
+    def _prefix_key(self, ip):
+        if ':' in ip:
+            b_addr = socket.inet_pton(socket.AF_INET6, ip)
+            network = b_addr[:6] + b'\x00' * 10
+            return '{}/48'.format(socket.inet_ntop(socket.AF_INET6, network))
+        return '{}.0/24'.format(ip.rsplit('.', 1)[0])
 
     def _RFC1918(self, ip):
         rfc1918 = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
@@ -34,15 +108,30 @@ class RIRLogStats:
         return False
 
     def _update_freq(self, ip):
-        rib_entry = self.rib.search_best(ip)
-        if not rib_entry:
-            return 0
-        cc = rib_entry.data['cc']
-        if cc not in self.freq:
-            self.freq[cc] = 1
-        else:
-            self.freq[cc] += 1
-        return 1
+        self.pending.append(ip)
+        if len(self.pending) >= self.batch_size:
+            self._flush_freq()
+
+    def _flush_freq(self):
+        if not self.pending:
+            return
+        results = self.index.lookup_many(self.pending)
+        for ip, rec in zip(self.pending, results):
+            if self.hh_addr:
+                self.hh_addr.update(ip)
+                self.hh_prefix.update(self._prefix_key(ip))
+            if not rec:
+                continue
+            cc = rec['cc']
+            if cc not in self.freq:
+                self.freq[cc] = 1
+                self.country[cc] = rec['country']
+            else:
+                self.freq[cc] += 1
+            if self.hh_alloc:
+                self.hh_alloc.update(rec['reg_id'] or rec['prefix'])
+            self.total += 1
+        self.pending = []
 
     def _print_freq_summary(self, title, total):
         if str(options.top).lower() == "all":
@@ -52,17 +141,45 @@ class RIRLogStats:
                 int(options.top), title)
         print(header)
 
+        if str(options.top).lower() == "all":
+            ranked = sorted(self.freq, key=self.freq.__getitem__, reverse=True)
+        else:
+            ranked = heapq.nlargest(
+                int(options.top), self.freq, key=self.freq.__getitem__)
         top = 1
-        for r in sorted(self.freq, key=self.freq.__getitem__, reverse=True):
-            if str(options.top).lower() != "all":
-                if top > int(options.top):
-                    break
+        for r in ranked:
             percent = (float(self.freq[r]) / total) * 100.0
             print('{:02d}: {:30s} | hits = {:8d} ({:5.2f}%)'.format(
                 top, self.country[r], self.freq[r], percent))
             top += 1
         print("""\
 ------------------------------------------------------------------""")
+        if self.hh_addr:
+            self._print_hh_summary(title, 'Address', self.hh_addr)
+            self._print_hh_summary(title, 'Prefix', self.hh_prefix)
+            self._print_hh_summary(title, 'Allocation', self.hh_alloc)
+
+    def _print_hh_summary(self, title, label, hh):
+        if str(options.top).lower() == "all":
+            entries = hh.top()
+            header = '\nAll {} Firewall Hits by {}'.format(title, label)
+        else:
+            entries = hh.top(int(options.top))
+            header = '\n Top {:d} {} Firewall Hits by {}'.format(
+                int(options.top), title, label)
+        print(header)
+        print(' (tracking {:d} of max {:d} keys, overcount <= {:d})\n'
+              .format(len(hh.counts), hh.capacity, hh.error_bound()))
+
+        top = 1
+        for key, count, error in entries:
+            percent = (float(count) / hh.total) * 100.0
+            print('{:02d}: {:30s} | hits = {:8d} ({:5.2f}%) '
+                  '(overcount <= {:d})'.format(
+                      top, key, count, percent, error))
+            top += 1
+        print("""\
+------------------------------------------------------------------""")
 
     def _asa_log(self, options):
         r_ip = r'((\d{1,3}\.){3}\d{1,3})'
@@ -84,7 +201,6 @@ class RIRLogStats:
         elif options.dst:
             gi = 3
 
-        total = 0
         if options.asa == "-":
             f = sys.stdin.readlines()
         else:
@@ -96,13 +212,14 @@ class RIRLogStats:
                 continue
             elif options.ipv4 and self._RFC1918(m.group(gi)):
                 continue
-            total += self._update_freq(m.group(gi))
+            self._update_freq(m.group(gi))
 
         try:
             f.close()
         except:
             pass
-        self._print_freq_summary('ASA', total)
+        self._flush_freq()
+        self._print_freq_summary('ASA', self.total)
 
     def _iptables_log(self, options):
         if options.ipv4:
@@ -116,7 +233,6 @@ class RIRLogStats:
             elif options.dst:
                 rxp = re.compile(r'.+DST=((\d{4}:){7}\d{4})')
 
-        total = 0
         if options.iptables == "-":
             f = sys.stdin.readlines()
         else:
@@ -128,12 +244,13 @@ class RIRLogStats:
                 continue
             elif options.ipv4 and self._RFC1918(m.group(1)):
                 continue
-            total += self._update_freq(m.group(1))
+            self._update_freq(m.group(1))
         try:
             f.close()
         except:
             pass
-        self._print_freq_summary('IPTABLES', total)
+        self._flush_freq()
+        self._print_freq_summary('IPTABLES', self.total)
 
     def _ipf_log(self, options):
         if options.ipv4:
@@ -147,7 +264,6 @@ class RIRLogStats:
             elif options.dst:
                 rxp = re.compile(r'.+\s->\s((\d{4}:){7}\d{4})\,\d+')
 
-        total = 0
         if options.ipf == "-":
             f = sys.stdin.readlines()
         else:
@@ -159,47 +275,20 @@ class RIRLogStats:
                 continue
             elif options.ipv4 and self._RFC1918(m.group(1)):
                 continue
-            total += self._update_freq(m.group(1))
+            self._update_freq(m.group(1))
         try:
             f.close()
         except:
             pass
-        self._print_freq_summary('IPF', total)
-
-    def _get_dbrecords(self, options):
-        cur = self.dbh.cursor()
-        if options.ipv4 and not options.ipv6:
-            sql_type = "WHERE rir.type = 'ipv4'"
-        elif not options.ipv4 and options.ipv6:
-            sql_type = "WHERE rir.type = 'ipv6'"
-        elif options.ipv4 and options.ipv6:
-            sql_type = "WHERE (rir.type = 'ipv4' OR rir.type = 'ipv6')"
-
-        sql = """\
-SELECT  rir.cc, country_codes.name,
-        rir.cidr, rir.start, rir.value, rir.type
-FROM rir
-LEFT JOIN country_codes
-ON country_codes.cc = rir.cc
-{}
-AND (rir.status = 'assigned' or rir.status = 'allocated')
-ORDER BY rir.cc, rir.type, rir.start_binary ASC
-""".format(sql_type)
-        cur.execute(sql)
-        for r in cur.fetchall():
-            cc = r[0]
-            country_name = r[1]
-            rirtype = r[5]
-            if rirtype == 'ipv4':
-                rnode = self.rib.add(r[2])
-            elif rirtype == 'ipv6':
-                rnode = self.rib.add('{}/{}'.format(r[3], r[4]))
-            else:
-                continue
-            if cc not in self.country:
-                self.country[cc] = country_name
-            rnode.data['cc'] = cc
-            rnode.data['country_name'] = country_name
+        self._flush_freq()
+        self._print_freq_summary('IPF', self.total)
+
+    def _load_index(self, options):
+        if options.lookupd:
+            self.index = RIRLookupClient(options.lookupd)
+        else:
+            self.index = RIRIndex(self.dbname).load(
+                options.ipv4, options.ipv6)
 
     def _verify_file(self, options):
         if options.iptables:
@@ -218,7 +307,8 @@ ORDER BY rir.cc, rir.type, rir.start_binary ASC
 
     def run(self, options):
         self._verify_file(options)
-        self._get_dbrecords(options)
+        self._init_heavy_hitters(options)
+        self._load_index(options)
         if options.iptables:
             self._iptables_log(options)
         elif options.asa:
@@ -273,8 +363,26 @@ if __name__ == '__main__':
     parser.add_argument(
         '--top', default=10, help='output top [N|all] countries'
     )
+    parser.add_argument(
+        '--heavy-hitters', action='store_true',
+        default=False,
+        help='also report top addresses, /24 (/48) prefixes and allocations'
+    )
+    parser.add_argument(
+        '--hh-capacity', type=int, default=1000,
+        help='max keys tracked per heavy hitter table (default 1000)'
+    )
+    parser.add_argument(
+        '--lookupd', nargs='?', const=default_socket(),
+        help='use a running rirlookupd.py (optional socket path)'
+    )
     options = parser.parse_args()
 
+    if options.hh_capacity < 1:
+        parser.print_help()
+        print('\nERROR: --hh-capacity must be at least 1')
+        sys.exit(1)
+
     if not (options.ipv4 or options.iptables):
         parser.print_help()
         print('\nERROR: Please specify the --ipv4 flag and a log format')
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+import argparse
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+import sqlite3
+import time
+
+
+METADATA_MARKER = b'\xab\xcd\xefMaxMind.com'
+EMPTY = -1
+
+# data types the spec fixes for metadata keys, libmaxminddb rejects
+# a file whose metadata uses any other type.
+UINT16 = 5
+UINT32 = 6
+UINT64 = 9
+METADATA_TYPES = {
+    'binary_format_major_version': UINT16,
+    'binary_format_minor_version': UINT16,
+    'build_epoch': UINT64,
+    'database_type': 2,
+    'description': 7,
+    'ip_version': UINT16,
+    'languages': 11,
+    'node_count': UINT32,
+    'record_size': UINT16,
+}
+
+
+class TypedInt:
+    """
+    Unsigned integer encoded with a fixed MMDB data type rather than
+    the smallest type that holds its value.
+    """
+
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+class MMDBWriter:
+    """
+    Writes a MaxMind DB (format 2.0) file with an IPv6 search tree and
+    32 bit records.  IPv4 networks are stored in the ::/96 subtree, the
+    layout libmaxminddb and other readers expect for IPv4 lookups.
+    """
+
+    def __init__(self, database_type, description):
+        self.database_type = database_type
+        self.description = description
+        self.left = [EMPTY]
+        self.right = [EMPTY]
+        self.data = bytearray()
+        self.data_offsets = {}
+        self.networks = []
+
+    def _ctrl(self, type, size):
+        if size < 29:
+            sizebits, extra = size, b''
+        elif size < 285:
+            sizebits, extra = 29, bytes([size - 29])
+        elif size < 65821:
+            sizebits, extra = 30, struct.pack('>H', size - 285)
+        else:
+            sizebits, extra = 31, struct.pack('>I', size - 65821)[1:]
+        if type <= 7:
+            return bytes([(type << 5) | sizebits]) + extra
+        return bytes([sizebits, type - 7]) + extra
+
+    def _encode(self, obj):
+        if isinstance(obj, dict):
+            out = self._ctrl(7, len(obj))
+            for k in sorted(obj):
+                out += self._encode(str(k)) + self._encode(obj[k])
+            return out
+        elif isinstance(obj, str):
+            b = obj.encode('utf-8')
+            return self._ctrl(2, len(b)) + b
+        elif isinstance(obj, bool):
+            return self._ctrl(14, int(obj))
+        elif isinstance(obj, TypedInt):
+            b = obj.value.to_bytes((obj.value.bit_length() + 7) // 8, 'big')
+            return self._ctrl(obj.type, len(b)) + b
+        elif isinstance(obj, int):
+            b = obj.to_bytes((obj.bit_length() + 7) // 8, 'big')
+            if obj < 2 ** 16:
+                type = 5
+            elif obj < 2 ** 32:
+                type = 6
+            elif obj < 2 ** 64:
+                type = 9
+            else:
+                type = 10
+            return self._ctrl(type, len(b)) + b
+        elif isinstance(obj, float):
+            return self._ctrl(3, 8) + struct.pack('>d', obj)
+        elif isinstance(obj, (list, tuple)):
+            out = self._ctrl(11, len(obj))
+            for v in obj:
+                out += self._encode(v)
+            return out
+        raise TypeError('cannot encode {!r}'.format(obj))
+
+    def _data_offset(self, record):
+        encoded = self._encode(record)
+        if encoded not in self.data_offsets:
+            self.data_offsets[encoded] = len(self.data)
+            self.data += encoded
+        return self.data_offsets[encoded]
+
+    def insert_network(self, network, record):
+        self.networks.append((network, self._data_offset(record)))
+
+    def _insert(self, value, prefixlen, leaf):
+        left = self.left
+        right = self.right
+        node = 0
+        for depth in range(prefixlen - 1):
+            children = right if (value >> (127 - depth)) & 1 else left
+            child = children[node]
+            if child < 0:
+                # empty, or a shorter prefix that gets pushed down
+                left.append(child)
+                right.append(child)
+                child = len(left) - 1
+                children[node] = child
+            node = child
+        if (value >> (128 - prefixlen)) & 1:
+            right[node] = leaf
+        else:
+            left[node] = leaf
+
+    def _build_tree(self):
+        # shortest prefixes first so more specific networks win
+        self.networks.sort(key=lambda n: n[0].prefixlen)
+        for network, offset in self.networks:
+            value = int(network.network_address)
+            prefixlen = network.prefixlen
+            if network.version == 4:
+                prefixlen += 96
+            if prefixlen == 0:
+                continue
+            self._insert(value, prefixlen, -(offset + 2))
+
+    def write(self, filename):
+        self._build_tree()
+        node_count = len(self.left)
+
+        def record(v):
+            if v == EMPTY:
+                return node_count
+            elif v < 0:
+                return node_count + 16 + (-v - 2)
+            return v
+
+        metadata = {
+            'binary_format_major_version': TypedInt(UINT16, 2),
+            'binary_format_minor_version': TypedInt(UINT16, 0),
+            'build_epoch': TypedInt(UINT64, int(time.time())),
+            'database_type': self.database_type,
+            'description': {'en': self.description},
+            'ip_version': TypedInt(UINT16, 6),
+            'languages': ['en'],
+            'node_count': TypedInt(UINT32, node_count),
+            'record_size': TypedInt(UINT16, 32),
+        }
+        tmpfile = '{}.tmp'.format(filename)
+        with open(tmpfile, 'wb') as f:
+            pack = struct.Struct('>II').pack
+            for i in range(node_count):
+                f.write(pack(record(self.left[i]), record(self.right[i])))
+            f.write(b'\x00' * 16)
+            f.write(self.data)
+            f.write(METADATA_MARKER)
+            f.write(self._encode(metadata))
+        os.replace(tmpfile, filename)
+        return node_count
+
+
+class MMDBReader:
+    """
+    Minimal MaxMind DB reader used to verify exported files.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self.buf.rfind(METADATA_MARKER)
+        if start < 0:
+            raise Exception('{}: not a MaxMind DB file'.format(filename))
+        start += len(METADATA_MARKER)
+        self._check_metadata_types(start)
+        self.metadata = self._decode(start, start)[0]
+        self.node_count = self.metadata['node_count']
+        self.record_size = self.metadata['record_size']
+        self.ip_version = self.metadata['ip_version']
+        self.node_bytes = self.record_size // 4
+        self.data_start = self.node_count * self.node_bytes + 16
+
+    def _type(self, offset):
+        type = self.buf[offset] >> 5
+        if type == 0:
+            type = 7 + self.buf[offset + 1]
+        return type
+
+    def _check_metadata_types(self, start):
+        if self._type(start) != 7:
+            raise Exception('metadata is not a map')
+        size = self.buf[start] & 0x1f
+        if size >= 29:
+            raise Exception('metadata map too large')
+        offset = start + 1
+        for i in range(size):
+            key, offset = self._decode(offset, start)
+            type = self._type(offset)
+            if key in METADATA_TYPES and type != METADATA_TYPES[key]:
+                raise Exception(
+                    'metadata {} has type {:d}, expected {:d}'.format(
+                        key, type, METADATA_TYPES[key]))
+            offset = self._decode(offset, start)[1]
+
+    def _decode(self, offset, base):
+        buf = self.buf
+        ctrl = buf[offset]
+        offset += 1
+        type = ctrl >> 5
+        if type == 1:
+            ss = (ctrl >> 3) & 3
+            v = ctrl & 7
+            if ss == 0:
+                p = (v << 8) | buf[offset]
+            elif ss == 1:
+                p = ((v << 16) | int.from_bytes(
+                    buf[offset:offset + 2], 'big')) + 2048
+            elif ss == 2:
+                p = ((v << 24) | int.from_bytes(
+                    buf[offset:offset + 3], 'big')) + 526336
+            else:
+                p = int.from_bytes(buf[offset:offset + 4], 'big')
+            return self._decode(base + p, base)[0], offset + ss + 1
+        if type == 0:
+            type = 7 + buf[offset]
+            offset += 1
+        size = ctrl & 0x1f
+        if size == 29:
+            size = 29 + buf[offset]
+            offset += 1
+        elif size == 30:
+            size = 285 + int.from_bytes(buf[offset:offset + 2], 'big')
+            offset += 2
+        elif size == 31:
+            size = 65821 + int.from_bytes(buf[offset:offset + 3], 'big')
+            offset += 3
+
+        if type == 2:
+            return buf[offset:offset + size].decode('utf-8'), offset + size
+        elif type == 3:
+            return struct.unpack('>d', buf[offset:offset + 8])[0], offset + 8
+        elif type == 4:
+            return bytes(buf[offset:offset + size]), offset + size
+        elif type in (5, 6, 9, 10):
+            return int.from_bytes(
+                buf[offset:offset + size], 'big'), offset + size
+        elif type == 8:
+            return int.from_bytes(
+                buf[offset:offset + size], 'big', signed=True), offset + size
+        elif type == 7:
+            obj = {}
+            for i in range(size):
+                k, offset = self._decode(offset, base)
+                obj[k], offset = self._decode(offset, base)
+            return obj, offset
+        elif type == 11:
+            obj = []
+            for i in range(size):
+                v, offset = self._decode(offset, base)
+                obj.append(v)
+            return obj, offset
+        elif type == 14:
+            return bool(size), offset
+        elif type == 15:
+            return struct.unpack('>f', buf[offset:offset + 4])[0], offset + 4
+        raise Exception('unsupported data type {:d}'.format(type))
+
+    def _read_record(self, node, bit):
+        offset = node * self.node_bytes
+        if self.record_size == 24:
+            offset += bit * 3
+            return int.from_bytes(self.buf[offset:offset + 3], 'big')
+        elif self.record_size == 28:
+            b = self.buf[offset:offset + 7]
+            if bit:
+                return ((b[3] & 0x0f) << 24) | int.from_bytes(b[4:7], 'big')
+            return ((b[3] & 0xf0) << 20) | int.from_bytes(b[0:3], 'big')
+        offset += bit * 4
+        return int.from_bytes(self.buf[offset:offset + 4], 'big')
+
+    def get(self, ip):
+        addr = ipaddress.ip_address(ip)
+        value = int(addr)
+        bits = 128 if self.ip_version == 6 else 32
+        if addr.version == 6 and bits == 32:
+            return None
+        node = 0
+        for depth in range(bits):
+            if node >= self.node_count:
+                break
+            node = self._read_record(node, (value >> (bits - 1 - depth)) & 1)
+        if node <= self.node_count:
+            return None
+        offset = self.data_start + node - self.node_count - 16
+        return self._decode(offset, self.data_start)[0]
+
+    def close(self):
+        self.buf.close()
+
+
+class RIRMMDBExport:
+
+    def __init__(self, dbname=None):
+        if not dbname:
+            dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
+            dbname = '{}/rir.db'.format(dbhome)
+        self.dbname = dbname
+        self.networks = []
+
+    def _get_dbrecords(self):
+        dbh = sqlite3.connect(self.dbname)
+        dbh.text_factory = str
+        cur = dbh.cursor()
+        sql = """\
+SELECT  rir.cc, country_codes.name,
+        rir.start, rir.value, rir.type, rir.registry, rir.status
+FROM rir
+LEFT JOIN country_codes
+ON country_codes.cc = rir.cc
+WHERE (rir.type = 'ipv4' OR rir.type = 'ipv6')
+AND (rir.status = 'assigned' or rir.status = 'allocated')
+"""
+        cur.execute(sql)
+        for cc, country, start, value, rirtype, registry, status \
+                in cur.fetchall():
+            record = {
+                'country': {'iso_code': cc, 'names': {'en': country or cc}},
+                'registry': registry,
+                'status': status,
+            }
+            if rirtype == 'ipv4':
+                first = ipaddress.IPv4Address(start)
+                last = first + int(value) - 1
+                for network in ipaddress.summarize_address_range(first, last):
+                    self.networks.append((network, record))
+            else:
+                network = ipaddress.IPv6Network(
+                    '{}/{}'.format(start, value), strict=False)
+                self.networks.append((network, record))
+        dbh.close()
+
+    def write(self, filename):
+        self._get_dbrecords()
+        writer = MMDBWriter(
+            'RIR-Country', 'RIR delegated assigned/allocated address space')
+        for network, record in self.networks:
+            writer.insert_network(network, record)
+        nodes = writer.write(filename)
+        print('[*] Wrote {:d} networks ({:d} nodes) to {}'.format(
+            len(self.networks), nodes, filename))
+
+    def verify(self, filename):
+        try:
+            reader = MMDBReader(filename)
+        except Exception as e:
+            print('[-] ERROR: {}'.format(e))
+            return 1
+        errs = 0
+        for network, record in self.networks:
+            for addr in (network.network_address, network.broadcast_address):
+                rec = reader.get(str(addr))
+                if not rec or rec['country']['iso_code'] != \
+                        record['country']['iso_code']:
+                    errs += 1
+        reader.close()
+        print('[*] Verified {:d} networks, {:d} errors'.format(
+            len(self.networks), errs))
+        return errs
+
+
+if __name__ == '__main__':
+
+    VERSION = '20261019_0900'
+    desc = """
+----------------------------------
+ {} version {}
+ Author: Joff Thyer (c) 2015-2026
+ Black Hills Information Security
+----------------------------------
+""".format(os.path.basename(sys.argv[0]), VERSION)
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=desc
+    )
+    parser.add_argument(
+        '--output', default='{}/.rirdb/rir-country.mmdb'.format(
+            os.path.expanduser('~')),
+        help='output file (default ~/.rirdb/rir-country.mmdb)'
+    )
+    parser.add_argument(
+        '--verify', action='store_true',
+        default=False, help='read back every exported network'
+    )
+    parser.add_argument(
+        '--lookup', nargs='+',
+        help='look up addresses in an existing MMDB file and exit'
+    )
+    options = parser.parse_args()
+
+    if options.lookup:
+        reader = MMDBReader(options.output)
+        for ip in options.lookup:
+            print('{}: {}'.format(ip, reader.get(ip)))
+        reader.close()
+        sys.exit(0)
+
+    print('{}'.format(desc))
+    export = RIRMMDBExport()
+    export.write(options.output)
+    if options.verify and export.verify(options.output):
+        sys.exit(1)
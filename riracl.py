@@ -1,20 +1,35 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import io
+import json
 import os
 import sys
 import struct
 import socket
 import sqlite3
+import time
+from contextlib import redirect_stdout
+from itertools import groupby
+from intervalset import IntervalSet
+from rirorg import RIROrgIndex
+from rirstore import RIRRecordStore
 
 
 class RIRACL:
 
+    # seconds after which a cache .tmp file is taken to be left behind
+    # by a run that died before renaming it into place
+    CACHE_TMP_AGE = 3600
+
     def __init__(self):
         dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
         self.dbname = '{}/rir.db'.format(dbhome)
+        self.snapshot = '{}/snapshot'.format(dbhome)
+        self.cachedir = '{}/aclcache'.format(dbhome)
         self.dbh = sqlite3.connect(self.dbname)
-        self.records = []
+        self.records = RIRRecordStore()
 
     def _cidr2mask(self, cidr):
         b_mask = (0xffffffff00000000 >> int(cidr)) & 0xffffffff
@@ -34,8 +49,7 @@ class RIRACL:
             sql_type = "WHERE (rir.type = 'ipv4' OR rir.type = 'ipv6')"
 
         sql = """\
-SELECT  rir.cc, country_codes.name,
-        rir.cidr, rir.start, rir.value, rir.type
+SELECT  rir.cc, country_codes.name, rir.type, rir.start, rir.value
 FROM rir
 LEFT JOIN country_codes
 ON country_codes.cc = rir.cc
@@ -43,15 +57,100 @@ ON country_codes.cc = rir.cc
 AND (rir.status = 'assigned' or rir.status = 'allocated')
 """.format(sql_type)
 
-        if options.cc:
-            sql += "AND rir.cc = '{}'".format(options.cc.upper())
+        params = []
+        ccs = options.allow or options.cc
+        if ccs:
+            sql += "AND rir.cc IN ({})\n".format(', '.join('?' * len(ccs)))
+            params += ccs
         elif options.country:
-            sql += "AND country_codes.name like '{}%'".format(options.country)
+            sql += "AND country_codes.name like ?\n"
+            params.append('{}%'.format(options.country))
+        if options.org or options.asn:
+            sql += "AND rir.reg_id = ?\n"
+            params.append(self._get_reg_id(options))
         sql += 'ORDER BY rir.cc, rir.type, rir.start_binary ASC'
 
-        cur.execute(sql)
-        for row in cur.fetchall():
-            self.records.append(row)
+        cur.execute(sql, params)
+        self.records.extend(cur)
+
+        if options.allow:
+            self._allow_records(options)
+        elif options.exclude:
+            self._exclude_records(options)
+
+    def _get_reg_id(self, options):
+        if options.org:
+            return options.org
+        reg_id = RIROrgIndex(self.dbh).reg_id_for_asn(options.asn)
+        if not reg_id:
+            print('ERROR: no organisation found for ASN {}'.format(
+                options.asn))
+            sys.exit(1)
+        return reg_id
+
+    def _exclude_sets(self, options):
+        networks = {'ipv4': [], 'ipv6': []}
+        for net in options.exclude or []:
+            rirtype = 'ipv6' if ':' in net else 'ipv4'
+            if '/' not in net:
+                net += '/128' if rirtype == 'ipv6' else '/32'
+            networks[rirtype].append(net)
+        try:
+            return {
+                'ipv4': IntervalSet.from_cidrs(networks['ipv4'], 32),
+                'ipv6': IntervalSet.from_cidrs(networks['ipv6'], 128),
+            }
+        except (OSError, ValueError):
+            print('ERROR: invalid --exclude network in {}'.format(
+                options.exclude))
+            sys.exit(1)
+
+    def _add_cidrs(self, records, cc, country, rirtype, iset):
+        for network, prefixlen in iset.cidrs():
+            end = network + (1 << (iset.bits - prefixlen)) - 1
+            records.add_range(cc, country, rirtype, network, end, prefixlen)
+
+    def _exclude_records(self, options):
+        exclude = self._exclude_sets(options)
+        store = self.records
+        records = RIRRecordStore()
+        for (cc, rirtype), rows in groupby(
+                range(len(store)), key=lambda i: (store.cc[i], store.type[i])):
+            rows = list(rows)
+            rirtype = store.rirtype(rows[0])
+            bits = 128 if rirtype == 'ipv6' else 32
+            iset = IntervalSet(
+                [(store.start(i), store.end(i)) for i in rows], bits)
+            iset = iset.difference(exclude[rirtype])
+            self._add_cidrs(
+                records, store.cc_of(rows[0]), store.country_of(rows[0]),
+                rirtype, iset)
+        self.records = records
+
+    def _allow_records(self, options):
+        exclude = self._exclude_sets(options)
+        store = self.records
+        found = set(store.cc_of(i) for i in range(len(store)))
+        missing = [c for c in options.allow if c not in found]
+        if missing:
+            # an empty allow set would deny the whole address space
+            print('ERROR: no address records for --allow {}'.format(
+                ','.join(missing)))
+            sys.exit(1)
+        cc = 'NOT-{}'.format('-'.join(options.allow))
+        country = 'All except {}'.format(', '.join(options.allow))
+        records = RIRRecordStore()
+        for rirtype, bits, wanted in (
+                ('ipv4', 32, options.ipv4), ('ipv6', 128, options.ipv6)):
+            if not wanted:
+                continue
+            allowed = IntervalSet([
+                (store.start(i), store.end(i)) for i in range(len(store))
+                if store.rirtype(i) == rirtype
+            ], bits)
+            deny = allowed.complement().difference(exclude[rirtype])
+            self._add_cidrs(records, cc, country, rirtype, deny)
+        self.records = records
 
     def _iplist(self, options):
         lastcc = ''
@@ -213,7 +312,114 @@ deny ip any object-group {}""".format(obj))
                     (name, seq, start, value))
             seq += 10
 
+    def _get_snapshot(self):
+        try:
+            with open(self.snapshot, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            st = os.stat(self.dbname)
+            return '{:d}_{:d}'.format(int(st.st_mtime), st.st_size)
+
+    def _cache_key(self, snapshot, options):
+        opts = dict(vars(options))
+        for opt in ('no_cache', 'cache_size'):
+            opts.pop(opt, None)
+        if opts['exclude']:
+            opts['exclude'] = sorted(opts['exclude'])
+        if opts['country']:
+            opts['country'] = opts['country'].lower()
+        digest = hashlib.sha256(
+            json.dumps(opts, sort_keys=True).encode()).hexdigest()
+        return '{}-{}'.format(snapshot, digest)
+
+    def _cache_evict(self, snapshot, max_bytes):
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cachedir)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.cachedir, name)
+            try:
+                if name.endswith('.tmp'):
+                    # fresh temporary files belong to runs still writing
+                    # their entry, old ones to runs that never finished
+                    st = os.stat(path)
+                    if now - st.st_mtime > self.CACHE_TMP_AGE:
+                        os.unlink(path)
+                    else:
+                        total += st.st_size
+                    continue
+                if not name.startswith(snapshot + '-'):
+                    os.unlink(path)
+                    continue
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def _cached_run(self, options):
+        # an unusable cache directory only means the run is not cached
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            snapshot = self._get_snapshot()
+        except OSError:
+            self._run(options)
+            return
+        key = self._cache_key(snapshot, options)
+        path = os.path.join(self.cachedir, key)
+        try:
+            with open(path, 'r') as f:
+                output = f.read()
+        except OSError:
+            output = None
+        if output is not None:
+            sys.stdout.write(output)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return
+
+        buf = io.StringIO()
+        try:
+            with redirect_stdout(buf):
+                self._run(options)
+        except SystemExit:
+            sys.stdout.write(buf.getvalue())
+            raise
+        tmpfile = '{}.{:d}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmpfile, 'w') as f:
+                f.write(buf.getvalue())
+            os.replace(tmpfile, path)
+        except OSError:
+            # output is still good, it just is not cached this time
+            try:
+                os.unlink(tmpfile)
+            except OSError:
+                pass
+        sys.stdout.write(buf.getvalue())
+        self._cache_evict(snapshot, options.cache_size * 1024 * 1024)
+
     def run(self, options):
+        if options.no_cache:
+            self._run(options)
+        else:
+            self._cached_run(options)
+
+    def _run(self, options):
         self._get_dbrecords(options)
         if options.iplist:
             self._iplist(options)
@@ -288,10 +494,46 @@ if __name__ == '__main__':
         '--country', help='search for a specific country name'
     )
     parser.add_argument(
-        '--cc', help='search for a specific country code'
+        '--cc', action='append',
+        help='search for country codes (repeat or comma separate)'
+    )
+    parser.add_argument(
+        '--allow', action='append',
+        help='deny everything except these country codes'
+    )
+    parser.add_argument(
+        '--exclude', action='append',
+        help='network never to deny, e.g. our own ranges (repeatable)'
+    )
+    parser.add_argument(
+        '--org', help='all resources held by an organisation reg_id'
+    )
+    parser.add_argument(
+        '--asn', help='all resources held by the organisation of an ASN'
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        default=False,
+        help='do not read or write the rendered output cache'
+    )
+    parser.add_argument(
+        '--cache-size', type=int, default=64,
+        help='output cache size limit in MB (default 64)'
     )
     options = parser.parse_args()
 
+    for opt in ('cc', 'allow'):
+        if getattr(options, opt):
+            setattr(options, opt, sorted(set(
+                c.strip().upper() for arg in getattr(options, opt)
+                for c in arg.split(',') if c.strip()
+            )))
+
+    if options.allow and (options.cc or options.country):
+        parser.print_help()
+        print('\nERROR: --allow cannot be combined with --cc or --country')
+        sys.exit(1)
+
     if not (options.ipv4 or options.ipv6):
         parser.print_help()
         print("""
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import radix
+import os
+import sqlite3
+from rirstore import RIRRecordStore
+
+
+class RIRIndex:
+    """
+    Longest prefix match index of assigned/allocated RIR address space.
+    Shared by logstats.py and the rirlookupd.py lookup daemon.
+    """
+
+    def __init__(self, dbname=None):
+        if not dbname:
+            dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
+            dbname = '{}/rir.db'.format(dbhome)
+        self.dbname = dbname
+        self.rib = radix.Radix()
+        self.store = RIRRecordStore()
+        self.prefixes = 0
+
+    def load(self, ipv4=True, ipv6=True):
+        if ipv4 and not ipv6:
+            sql_type = "WHERE rir.type = 'ipv4'"
+        elif not ipv4 and ipv6:
+            sql_type = "WHERE rir.type = 'ipv6'"
+        else:
+            sql_type = "WHERE (rir.type = 'ipv4' OR rir.type = 'ipv6')"
+
+        sql = """\
+SELECT  rir.cc, country_codes.name, rir.type, rir.start, rir.value,
+        rir.registry, rir.status, rir.date, rir.reg_id, rir.cidr
+FROM rir
+LEFT JOIN country_codes
+ON country_codes.cc = rir.cc
+{}
+AND (rir.status = 'assigned' or rir.status = 'allocated')
+ORDER BY rir.cc, rir.type, rir.start_binary ASC
+""".format(sql_type)
+        dbh = sqlite3.connect(self.dbname)
+        dbh.text_factory = str
+        cur = dbh.cursor()
+        cur.execute(sql)
+        self.store.extend(self._add_nodes(cur, len(self.store)))
+        self.prefixes = len(self.store)
+        dbh.close()
+        return self
+
+    def _add_nodes(self, rows, base):
+        """
+        Add a radix node for each row as it streams from the cursor into
+        the column store, so the result set is walked only once.
+        """
+        add = self.rib.add
+        for i, r in enumerate(rows, base):
+            if r[2] == 'ipv4':
+                rnode = add(r[9])
+            else:
+                rnode = add('{}/{}'.format(r[3], r[4]))
+            # records live in the column store, the node keeps its row
+            rnode.data['i'] = i
+            yield r
+
+    def lookup(self, ip):
+        try:
+            rib_entry = self.rib.search_best(ip)
+        except ValueError:
+            return None
+        if not rib_entry:
+            return None
+        rec = {'ip': ip, 'prefix': rib_entry.prefix}
+        rec.update(self.store.record(rib_entry.data['i']))
+        return rec
+
+    def lookup_many(self, ips):
+        lookup = self.lookup
+        return [lookup(ip) for ip in ips]
+
+
+_default_index = None
+
+
+def lookup_many(ips, dbname=None):
+    """
+    Attribute an iterable of addresses against the local RIR database.
+    Returns one result dict (or None) per address, in order.  The index
+    is loaded on first use and reused by later calls.
+    """
+    global _default_index
+    if _default_index is None or \
+            (dbname and _default_index.dbname != dbname):
+        _default_index = RIRIndex(dbname).load()
+    return _default_index.lookup_many(ips)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from ririndex import RIRIndex
+from rirlookupd import RIRLookupClient, default_socket
+
+
+class RIRLookup:
+
+    FIELDS = ['cc', 'country', 'registry', 'status', 'date', 'reg_id', 'prefix']
+
+    def __init__(self):
+        self.index = None
+        self.writer = csv.writer(sys.stdout)
+        self.header = None
+        self.rows = 0
+        self.matched = 0
+
+    def _read_plain(self, f, options):
+        if not self.header:
+            self.header = ['ip']
+            self._write_header(options)
+        for line in f:
+            ip = line.strip()
+            if not ip or ip.startswith('#'):
+                continue
+            yield [ip], ip
+
+    def _read_csv(self, f, options):
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if options.column.isdigit():
+            col = int(options.column) - 1
+        elif options.column in header:
+            col = header.index(options.column)
+        else:
+            print('ERROR: column [{}] not found in header'.format(
+                options.column), file=sys.stderr)
+            sys.exit(1)
+        if not self.header:
+            self.header = header
+            self._write_header(options)
+        for row in reader:
+            if len(row) <= col:
+                continue
+            yield row, row[col].strip()
+
+    def _write_header(self, options):
+        if not options.jsonl:
+            self.writer.writerow(self.header + self.FIELDS)
+
+    def _write_batch(self, batch, options):
+        results = self.index.lookup_many([ip for row, ip in batch])
+        for (row, ip), rec in zip(batch, results):
+            self.rows += 1
+            if rec:
+                self.matched += 1
+                values = [rec[k] for k in self.FIELDS]
+            else:
+                values = [''] * len(self.FIELDS)
+            if options.jsonl:
+                obj = dict(zip(self.header, row))
+                obj.update(zip(self.FIELDS, values))
+                sys.stdout.write(json.dumps(obj) + '\n')
+            else:
+                self.writer.writerow(row + values)
+
+    def _load_index(self, options):
+        if options.lookupd:
+            self.index = RIRLookupClient(options.lookupd)
+        else:
+            self.index = RIRIndex().load()
+
+    def run(self, options):
+        self._load_index(options)
+        start = time.time()
+        for file in options.files:
+            if file == '-':
+                f = sys.stdin
+            else:
+                f = open(file, 'r', newline='')
+            if options.csv:
+                rows = self._read_csv(f, options)
+            else:
+                rows = self._read_plain(f, options)
+
+            batch = []
+            for item in rows:
+                batch.append(item)
+                if len(batch) >= options.batch:
+                    self._write_batch(batch, options)
+                    batch = []
+            if batch:
+                self._write_batch(batch, options)
+            if f is not sys.stdin:
+                f.close()
+        sys.stdout.flush()
+
+        if options.stats:
+            elapsed = time.time() - start
+            rate = self.rows / elapsed if elapsed else 0
+            print('[*] {:d} rows, {:d} matched, {:.2f}s, {:.0f} rows/sec'
+                  .format(self.rows, self.matched, elapsed, rate),
+                  file=sys.stderr)
+
+
+if __name__ == '__main__':
+
+    VERSION = '20261019_0900'
+    desc = """
+----------------------------------
+ {} version {}
+ Author: Joff Thyer (c) 2015-2026
+ Black Hills Information Security
+----------------------------------
+""".format(os.path.basename(sys.argv[0]), VERSION)
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=desc
+    )
+    parser.add_argument(
+        'files', nargs='*', default=['-'],
+        help='input files, one address per line (default stdin)'
+    )
+    parser.add_argument(
+        '--csv', action='store_true',
+        default=False, help='input is CSV with a header row'
+    )
+    parser.add_argument(
+        '--column', default='ip',
+        help='CSV column name or 1-based number holding the address'
+    )
+    parser.add_argument(
+        '--jsonl', action='store_true',
+        default=False, help='output JSON lines instead of CSV'
+    )
+    parser.add_argument(
+        '--batch', type=int, default=10000,
+        help='addresses resolved per batch (default 10000)'
+    )
+    parser.add_argument(
+        '--lookupd', nargs='?', const=default_socket(),
+        help='use a running rirlookupd.py (optional socket path)'
+    )
+    parser.add_argument(
+        '--stats', action='store_true',
+        default=False, help='print throughput statistics to stderr'
+    )
+    options = parser.parse_args()
+
+    rirlookup = RIRLookup()
+    rirlookup.run(options)
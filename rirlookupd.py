@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ririndex import RIRIndex
+
+
+class RIRLookupService:
+    """
+    Holds a hot RIRIndex and swaps in a freshly built one whenever
+    build_rir_database.py finishes an update (lastfetchdate is written
+    as the final step of a successful run).
+    """
+
+    def __init__(self, dbname=None):
+        dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
+        self.dbname = dbname or '{}/rir.db'.format(dbhome)
+        self.lastfetch = '{}/lastfetchdate'.format(dbhome)
+        self.lock = threading.Lock()
+        self.index = None
+        self.loaded = 0
+        self.stamp = None
+
+    def _stamp(self):
+        try:
+            return os.stat(self.lastfetch).st_mtime
+        except OSError:
+            return None
+
+    def reload(self):
+        with self.lock:
+            stamp = self._stamp()
+            start = time.time()
+            index = RIRIndex(self.dbname).load()
+            # single reference assignment, in-flight queries finish
+            # against the old index.
+            self.index = index
+            self.loaded = time.time()
+            self.stamp = stamp
+            print('[*] Loaded {:d} prefixes in {:.2f}s'.format(
+                index.prefixes, self.loaded - start))
+
+    def watch(self, interval):
+        while True:
+            time.sleep(interval)
+            if self._stamp() != self.stamp:
+                try:
+                    self.reload()
+                except Exception as e:
+                    print('[-] ERROR: reload failed: {}'.format(e))
+
+    def lookup_many(self, ips):
+        if not isinstance(ips, list) or \
+                not all(isinstance(ip, str) for ip in ips):
+            raise ValueError('ips must be a list of address strings')
+        return self.index.lookup_many(ips)
+
+    def status(self):
+        return {
+            'prefixes': self.index.prefixes,
+            'loaded': int(self.loaded),
+        }
+
+
+class UnixRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Newline delimited JSON.  Each request line is {"ips": [...]}
+    and is answered by one {"results": [...]} line.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                ips = json.loads(line)['ips']
+                reply = {'results': self.server.service.lookup_many(ips)}
+            except Exception as e:
+                reply = {'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+
+class UnixLookupServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class HTTPRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /lookup?ip=A&ip=B
+    POST /lookup    {"ips": [...]}
+    GET  /status
+    """
+
+    def _reply(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _lookup(self, ips):
+        try:
+            results = self.server.service.lookup_many(ips)
+        except Exception as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(200, {'results': results})
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == '/status':
+            self._reply(200, self.server.service.status())
+        elif url.path == '/lookup':
+            self._lookup(urllib.parse.parse_qs(url.query).get('ip', []))
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path != '/lookup':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            ips = json.loads(self.rfile.read(length))['ips']
+        except Exception as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._lookup(ips)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RIRLookupClient:
+    """
+    Client for the rirlookupd.py Unix socket, usable wherever an
+    RIRIndex is expected for lookup_many().
+    """
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+
+    def lookup_many(self, ips):
+        request = json.dumps({'ips': list(ips)}).encode() + b'\n'
+        self.sock.sendall(request)
+        reply = json.loads(self.rfile.readline())
+        if 'error' in reply:
+            raise Exception(reply['error'])
+        return reply['results']
+
+    def lookup(self, ip):
+        return self.lookup_many([ip])[0]
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+def default_socket():
+    return '{}/.rirdb/rirlookupd.sock'.format(os.path.expanduser('~'))
+
+
+if __name__ == '__main__':
+
+    VERSION = '20261019_0900'
+    desc = """
+----------------------------------
+ {} version {}
+ Author: Joff Thyer (c) 2015-2026
+ Black Hills Information Security
+----------------------------------
+""".format(os.path.basename(sys.argv[0]), VERSION)
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=desc
+    )
+    parser.add_argument(
+        '--socket', default=default_socket(),
+        help='unix socket path (default ~/.rirdb/rirlookupd.sock)'
+    )
+    parser.add_argument(
+        '--port', type=int, default=8053,
+        help='localhost HTTP port, 0 to disable (default 8053)'
+    )
+    parser.add_argument(
+        '--reload-interval', type=int, default=60,
+        help='seconds between database update checks (default 60)'
+    )
+    options = parser.parse_args()
+
+    print('{}'.format(desc))
+    service = RIRLookupService()
+    service.reload()
+
+    if os.path.exists(options.socket):
+        os.unlink(options.socket)
+    unix_server = UnixLookupServer(options.socket, UnixRequestHandler)
+    unix_server.service = service
+    threading.Thread(target=unix_server.serve_forever, daemon=True).start()
+    print('[*] Listening on {}'.format(options.socket))
+
+    if options.port:
+        http_server = ThreadingHTTPServer(
+            ('127.0.0.1', options.port), HTTPRequestHandler)
+        http_server.daemon_threads = True
+        http_server.service = service
+        threading.Thread(
+            target=http_server.serve_forever, daemon=True).start()
+        print('[*] Listening on http://127.0.0.1:{:d}/'.format(options.port))
+
+    signal.signal(
+        signal.SIGHUP,
+        lambda signum, frame: threading.Thread(target=service.reload).start()
+    )
+    try:
+        service.watch(options.reload_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(options.socket)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import sqlite3
+from intervalset import ip2int
+
+
+class RIROrgIndex:
+    """
+    Organisation lookups over the reg_id index built at ingest time.
+    An ASN or address is resolved to its holding reg_id through the
+    org_index table, and the reg_id to all its resources through the
+    rir_reg_id index.
+    """
+
+    def __init__(self, dbh=None):
+        if not dbh:
+            dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
+            dbh = sqlite3.connect('{}/rir.db'.format(dbhome))
+            dbh.text_factory = str
+        self.dbh = dbh
+
+    def _resolve(self, type, value):
+        cur = self.dbh.cursor()
+        sql = """\
+SELECT reg_id, last FROM org_index
+WHERE type = ? AND first <= ?
+ORDER BY first DESC
+LIMIT 1
+"""
+        try:
+            cur.execute(sql, [type, value])
+        except sqlite3.OperationalError:
+            print('ERROR: no organisation index, run build_rir_database.py')
+            sys.exit(1)
+        row = cur.fetchone()
+        if row and row[1] >= value:
+            return row[0]
+        return None
+
+    def _asn2int(self, asn):
+        """
+        Convert an asplain (AS65536) or asdot (AS1.0) number to its
+        32-bit value.
+        """
+        asn = str(asn).strip().upper()
+        if asn.startswith('AS'):
+            asn = asn[2:]
+        parts = asn.split('.')
+        if len(parts) > 2 or not all(p.isdigit() for p in parts):
+            raise ValueError(asn)
+        if len(parts) == 2:
+            high, low = int(parts[0]), int(parts[1])
+            if high > 0xffff or low > 0xffff:
+                raise ValueError(asn)
+            return (high << 16) | low
+        value = int(parts[0])
+        if value > 0xffffffff:
+            raise ValueError(asn)
+        return value
+
+    def reg_id_for_asn(self, asn):
+        try:
+            value = self._asn2int(asn)
+        except ValueError:
+            print('ERROR: invalid ASN {}'.format(asn))
+            sys.exit(1)
+        return self._resolve('asn', value)
+
+    def reg_id_for_ip(self, ip):
+        try:
+            value = ip2int(ip)
+        except (OSError, ValueError):
+            print('ERROR: invalid IP address {}'.format(ip))
+            sys.exit(1)
+        if ':' in ip:
+            return self._resolve('ipv6', value >> 64)
+        return self._resolve('ipv4', value)
+
+    def resources(self, reg_id):
+        cur = self.dbh.cursor()
+        sql = """\
+SELECT  rir.registry, rir.cc, rir.type, rir.start, rir.value,
+        rir.date, rir.status
+FROM rir
+WHERE rir.reg_id = ?
+AND (rir.status = 'assigned' or rir.status = 'allocated')
+ORDER BY rir.type, rir.start_binary ASC
+"""
+        cur.execute(sql, [reg_id])
+        return cur.fetchall()
+
+    def run(self, options):
+        if options.org:
+            reg_id = options.org
+        elif options.asn:
+            reg_id = self.reg_id_for_asn(options.asn)
+        else:
+            reg_id = self.reg_id_for_ip(options.ip)
+        if not reg_id:
+            print('No organisation found')
+            return
+        print('\n# reg_id: {}'.format(reg_id))
+        for registry, cc, type, start, value, date, status \
+                in self.resources(reg_id):
+            if type == 'asn':
+                resource = 'AS{}'.format(start)
+                if int(value) > 1:
+                    resource += '-AS{}'.format(int(start) + int(value) - 1)
+            elif type == 'ipv6':
+                resource = '{}/{}'.format(start, value)
+            else:
+                resource = '{} ({} addresses)'.format(start, value)
+            print('{:8s} {:2s} {:4s} {:40s} {} {}'.format(
+                registry, cc, type, resource, date, status))
+
+
+if __name__ == '__main__':
+
+    VERSION = '20261019_0900'
+    desc = """
+----------------------------------
+ {} version {}
+ Author: Joff Thyer (c) 2015-2026
+ Black Hills Information Security
+----------------------------------
+""".format(os.path.basename(sys.argv[0]), VERSION)
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=desc
+    )
+    parser.add_argument(
+        '--org', help='list resources held by a reg_id'
+    )
+    parser.add_argument(
+        '--asn', help='list resources held by the owner of an ASN'
+    )
+    parser.add_argument(
+        '--ip', help='list resources held by the owner of an address'
+    )
+    options = parser.parse_args()
+
+    if not (options.org or options.asn or options.ip):
+        parser.print_help()
+        print('\nERROR: please specify one of --org, --asn or --ip')
+        sys.exit(1)
+
+    rirorg = RIROrgIndex()
+    rirorg.run(options)
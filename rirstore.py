@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import socket
+import struct
+from array import array
+from intervalset import int2ip
+
+
+TYPES = {'ipv4': 4, 'ipv6': 6}
+TYPE_NAMES = {4: 'ipv4', 6: 'ipv6'}
+MASK64 = (1 << 64) - 1
+
+
+class RIRRecordStore:
+    """
+    Column store for loaded RIR address records, shared by riracl.py and
+    the ririndex.py lookup index.  Addresses, prefix lengths and dates are
+    held in typed arrays, country and registry as small integer codes, and
+    all remaining text in one interned string table.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._string_ids = {}
+        self.cc_codes = []
+        self.country_codes = []
+        self._cc_ids = {}
+        self.registry_codes = []
+        self._registry_ids = {}
+
+        self.type = array('B')
+        self.start_hi = array('Q')
+        self.start_lo = array('Q')
+        self.end_hi = array('Q')
+        self.end_lo = array('Q')
+        self.plen = array('B')
+        self.cc = array('H')
+        self.registry = array('B')
+        self.status = array('I')
+        self.date = array('I')
+        self.reg_id = array('I')
+
+    def __len__(self):
+        return len(self.type)
+
+    def __iter__(self):
+        for i in range(len(self.type)):
+            yield self.row(i)
+
+    def _intern(self, s):
+        s = s or ''
+        i = self._string_ids.setdefault(s, len(self._string_ids))
+        if i == len(self.strings):
+            self.strings.append(s)
+        return i
+
+    def _cc_code(self, cc, country):
+        if cc not in self._cc_ids:
+            self._cc_ids[cc] = len(self.cc_codes)
+            self.cc_codes.append(self._intern(cc))
+            self.country_codes.append(
+                self._intern(country) if country is not None else None)
+        return self._cc_ids[cc]
+
+    def _registry_code(self, registry):
+        if registry not in self._registry_ids:
+            self._registry_ids[registry] = len(self.registry_codes)
+            self.registry_codes.append(self._intern(registry))
+        return self._registry_ids[registry]
+
+    def add_range(self, cc, country, rirtype, start, end, plen,
+                  registry='', status='', date='', reg_id=''):
+        self.type.append(TYPES[rirtype])
+        self.start_hi.append(start >> 64)
+        self.start_lo.append(start & MASK64)
+        self.end_hi.append(end >> 64)
+        self.end_lo.append(end & MASK64)
+        self.plen.append(plen)
+        self.cc.append(self._cc_code(cc, country))
+        self.registry.append(self._registry_code(registry))
+        self.status.append(self._intern(status))
+        self.date.append(int(date) if date and date.isdigit() else 0)
+        self.reg_id.append(self._intern(reg_id))
+        return len(self.type) - 1
+
+    def extend(self, rows):
+        """
+        Bulk load (cc, country, type, start, value[, registry, status,
+        date, reg_id]) rows, as returned by the database queries.
+        """
+        unpack = struct.Struct('!L').unpack
+        aton = socket.inet_aton
+        pton = socket.inet_pton
+        from_bytes = int.from_bytes
+        string_ids = self._string_ids
+        intern = string_ids.setdefault
+        cc_ids = self._cc_ids
+        registry_ids = self._registry_ids
+        type_append = self.type.append
+        start_hi_append = self.start_hi.append
+        start_lo_append = self.start_lo.append
+        end_hi_append = self.end_hi.append
+        end_lo_append = self.end_lo.append
+        plen_append = self.plen.append
+        cc_append = self.cc.append
+        registry_append = self.registry.append
+        status_append = self.status.append
+        date_append = self.date.append
+        reg_id_append = self.reg_id.append
+        for row in rows:
+            if len(row) > 5:
+                (cc, country, rirtype, start, value,
+                 registry, status, date, reg_id) = row[:9]
+            else:
+                cc, country, rirtype, start, value = row
+                registry = status = date = reg_id = ''
+            if rirtype == 'ipv4':
+                first = unpack(aton(start))[0]
+                count = int(value)
+                type_append(4)
+                start_hi_append(0)
+                start_lo_append(first)
+                end_hi_append(0)
+                end_lo_append(first + count - 1)
+                # same prefix length rule as the cidr column at ingest
+                plen_append(33 - count.bit_length())
+            else:
+                b = pton(socket.AF_INET6, start)
+                plen = int(value)
+                last = from_bytes(b, 'big') + (1 << (128 - plen)) - 1
+                type_append(6)
+                start_hi_append(from_bytes(b[:8], 'big'))
+                start_lo_append(from_bytes(b[8:], 'big'))
+                end_hi_append(last >> 64)
+                end_lo_append(last & MASK64)
+                plen_append(plen)
+            if cc in cc_ids:
+                cc_append(cc_ids[cc])
+            else:
+                cc_append(self._cc_code(cc, country))
+            if registry in registry_ids:
+                registry_append(registry_ids[registry])
+            else:
+                registry_append(self._registry_code(registry))
+            status_append(intern(status or '', len(string_ids)))
+            reg_id_append(intern(reg_id or '', len(string_ids)))
+            date_append(int(date) if date and date.isdigit() else 0)
+        # strings interned above were only added to the id map
+        self.strings.extend(list(string_ids)[len(self.strings):])
+
+    def rirtype(self, i):
+        return TYPE_NAMES[self.type[i]]
+
+    def start(self, i):
+        return (self.start_hi[i] << 64) | self.start_lo[i]
+
+    def end(self, i):
+        return (self.end_hi[i] << 64) | self.end_lo[i]
+
+    def cc_of(self, i):
+        return self.strings[self.cc_codes[self.cc[i]]]
+
+    def country_of(self, i):
+        s = self.country_codes[self.cc[i]]
+        return self.strings[s] if s is not None else None
+
+    def prefix(self, i):
+        bits = 32 if self.type[i] == 4 else 128
+        return '{}/{:d}'.format(int2ip(self.start(i), bits), self.plen[i])
+
+    def row(self, i):
+        """
+        (cc, country, cidr, start, value, type) in the shape of the
+        riracl.py database query.
+        """
+        start = self.start(i)
+        if self.type[i] == 4:
+            ip = int2ip(start, 32)
+            return (
+                self.cc_of(i), self.country_of(i),
+                '{}/{:d}'.format(ip, self.plen[i]), ip,
+                str(self.end(i) - start + 1), 'ipv4'
+            )
+        return (
+            self.cc_of(i), self.country_of(i), '',
+            int2ip(start, 128), str(self.plen[i]), 'ipv6'
+        )
+
+    def record(self, i):
+        date = self.date[i]
+        return {
+            'cc': self.cc_of(i),
+            'country': self.country_of(i),
+            'registry': self.strings[self.registry_codes[self.registry[i]]],
+            'status': self.strings[self.status[i]],
+            'date': str(date) if date else '',
+            'reg_id': self.strings[self.reg_id[i]],
+        }
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import sqlite3
+
+
+class RIRSummary:
+
+    UNITS = {'ipv4': 'addrs', 'ipv6': '/64s', 'asn': 'asns'}
+
+    def __init__(self):
+        dbhome = '{}/.rirdb'.format(os.path.expanduser('~'))
+        self.dbname = '{}/rir.db'.format(dbhome)
+        self.dbh = sqlite3.connect(self.dbname)
+        self.dbh.text_factory = str
+
+    def _get_dbrecords(self, options):
+        cur = self.dbh.cursor()
+        if options.cc:
+            scope, key = 'cc', options.cc.upper()
+        elif options.registry:
+            scope, key = 'registry', options.registry.lower()
+        else:
+            scope, key = 'total', '*'
+        sql = """\
+SELECT  key, type, status, records, prefixes, units,
+        records_delta, prefixes_delta, units_delta, date, prev_date
+FROM rir_summary_report
+WHERE scope = ? AND key = ?
+"""
+        params = [scope, key]
+        if options.type:
+            sql += 'AND type = ?\n'
+            params.append(options.type)
+        if not options.all_status:
+            sql += "AND (status = 'assigned' OR status = 'allocated')\n"
+        sql += 'ORDER BY type, status'
+        try:
+            cur.execute(sql, params)
+        except sqlite3.OperationalError:
+            print('ERROR: no summary tables, run build_rir_database.py')
+            sys.exit(1)
+        return cur.fetchall()
+
+    def run(self, options):
+        rows = self._get_dbrecords(options)
+        if not rows:
+            print('No summary data found')
+            return
+        print('\n Address Space Summary for [{}] on {} (delta since {})\n'
+              .format(rows[0][0], rows[0][9], rows[0][10]))
+        for r in rows:
+            print('{:5s} {:10s} | records = {:8d} ({:+d}) | '
+                  'prefixes = {:8d} ({:+d}) | {} = {:d} ({:+d})'.format(
+                      r[1], r[2], r[3], r[6], r[4], r[7],
+                      self.UNITS.get(r[1], 'units'), r[5], r[8]))
+        print("""\
+------------------------------------------------------------------""")
+
+
+if __name__ == '__main__':
+
+    VERSION = '20261019_0900'
+    desc = """
+----------------------------------
+ {} version {}
+ Author: Joff Thyer (c) 2015-2026
+ Black Hills Information Security
+----------------------------------
+""".format(os.path.basename(sys.argv[0]), VERSION)
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=desc
+    )
+    parser.add_argument(
+        '--cc', help='summary for a country code'
+    )
+    parser.add_argument(
+        '--registry', help='summary for a registry (arin, ripencc, ...)'
+    )
+    parser.add_argument(
+        '--type', choices=['ipv4', 'ipv6', 'asn'],
+        help='restrict to one resource type'
+    )
+    parser.add_argument(
+        '--all-status', action='store_true',
+        default=False, help='include available/reserved records'
+    )
+    options = parser.parse_args()
+
+    rirsummary = RIRSummary()
+    rirsummary.run(options)